@@ -1,197 +1,335 @@
 #!/usr/bin/env python3
 
 import argparse
+import concurrent.futures
+import functools
 import hashlib
-import io
+import itertools
 import logging
 import lzma
+import mmap
 import os
+import struct
 
+import numpy as np
 from PIL import Image
 import texture2ddecoder
 import zstandard
 
 
-class Reader(io.BytesIO):
+_UINT16 = {"little": struct.Struct("<H"), "big": struct.Struct(">H")}
+_INT32 = {"little": struct.Struct("<i"), "big": struct.Struct(">i")}
+_UINT32 = {"little": struct.Struct("<I"), "big": struct.Struct(">I")}
+_UINT64 = {"little": struct.Struct("<Q"), "big": struct.Struct(">Q")}
+
+
+class Reader:
     def __init__(self, stream):
-        super().__init__(stream)
-        self._bytes_left = len(stream)
+        self._mv = memoryview(stream)
         self._bytes_read = 0
 
     def __len__(self):
-        return 0 if self._bytes_left < 0 else self._bytes_left
+        return len(self._mv) - self._bytes_read
+
+    def tell(self):
+        return self._bytes_read
 
     def align_to(self, alignment):
-        remainder = alignment - (self._bytes_read % alignment)
-        self.read(remainder if remainder != alignment else 0)
+        aligned = self._bytes_read + (-self._bytes_read % alignment)
+        self._bytes_read = min(aligned, len(self._mv))
 
     def read(self, size=-1):
+        start = self._bytes_read
         if size == -1:
-            self._bytes_read += self._bytes_left
-            self._bytes_left = 0
+            self._bytes_read = len(self._mv)
         else:
-            self._bytes_left -= size
-            self._bytes_read += size
-        return super().read(size)
+            self._bytes_read = min(start + size, len(self._mv))
+        return self._mv[start : self._bytes_read]
 
-    def read_byte(self, byteorder="little"):
-        return int.from_bytes(self.read(1), byteorder)
+    def skip(self, size):
+        # advance without materializing a view of the skipped bytes
+        self._bytes_read = min(self._bytes_read + size, len(self._mv))
+
+    def read_byte(self):
+        byte = self._mv[self._bytes_read]
+        self._bytes_read += 1
+        return byte
 
     def read_uint16(self, byteorder="little"):
-        return int.from_bytes(self.read(2), byteorder)
+        return _UINT16[byteorder].unpack(self.read(2))[0]
 
     def read_int32(self, byteorder="little"):
-        return int.from_bytes(self.read(4), byteorder, signed=True)
+        return _INT32[byteorder].unpack(self.read(4))[0]
 
     def read_uint32(self, byteorder="little"):
-        return int.from_bytes(self.read(4), byteorder)
+        return _UINT32[byteorder].unpack(self.read(4))[0]
 
     def read_uint64(self, byteorder="little"):
-        return int.from_bytes(self.read(8), byteorder)
+        return _UINT64[byteorder].unpack(self.read(8))[0]
 
     def read_string(self, encoding="utf-8"):
         length = self.read_byte()
-        return self.read(length).decode("utf-8")
+        return bytes(self.read(length)).decode("utf-8")
+
+
+_CHUNK_SIZE = 1 << 20
+
+# One reusable context for all zstd frames; LZMA decompressors hold
+# per-stream state and stay local to decompress().
+_ZSTD_DECOMPRESSOR = zstandard.ZstdDecompressor()
+
+
+@functools.cache
+def _lzham():
+    # Credits: https://github.com/Galaxy1036/pylzham
+    import lzham
 
+    return lzham
 
-def decompress(data):
+
+def decompress(data, hasher=None):
     if data[0:4] == b"SCLZ":
         logging.debug("Decompressing using LZHAM ...")
-        # Credits: https://github.com/Galaxy1036/pylzham
-        import lzham
-
-        dict_size = int.from_bytes(data[4:5], byteorder="big")
-        uncompressed_size = int.from_bytes(data[5:9], byteorder="little")
+        dict_size = data[4]
+        uncompressed_size = _UINT32["little"].unpack_from(data, 5)[0]
 
         logging.debug(f"dict size: {dict_size}")
         logging.debug(f"uncompressed size: {uncompressed_size}")
 
-        decompressed = lzham.decompress(
-            data[9:], uncompressed_size, {"dict_size_log2": dict_size}
+        decompressed = _lzham().decompress(
+            bytes(data[9:]), uncompressed_size, {"dict_size_log2": dict_size}
         )
     elif data[0:4] == zstandard.FRAME_HEADER:
         logging.debug("Decompressing using ZSTD ...")
-        decompressed = zstandard.decompress(data)
+        # Stream with a bounded output buffer instead of materializing
+        # the frame in one shot; also works when the frame header does
+        # not declare the content size.
+        decompressed = bytearray()
+        with _ZSTD_DECOMPRESSOR.stream_reader(data) as stream:
+            while chunk := stream.read(_CHUNK_SIZE):
+                if hasher is not None:
+                    hasher.update(chunk)
+                decompressed += chunk
+        return bytes(decompressed)
     else:
         logging.debug("Decompressing using LZMA ...")
-        # fix uncompressed size to 64 bit
-        data = data[0:9] + (b"\x00" * 4) + data[9:]
+        data = memoryview(data)
 
         prop = data[0]
         if prop > (4 * 5 + 4) * 9 + 8:
             raise Exception("LZMA properties error")
-        pb = int(prop / (9 * 5))
-        prop -= int(pb * 9 * 5)
-        lp = int(prop / 9)
-        lc = int(prop - lp * 9)
+        pb, prop = divmod(prop, 9 * 5)
+        lp, lc = divmod(prop, 9)
         logging.debug(f"literal context bits: {lc}")
         logging.debug(f"literal position bits: {lp}")
         logging.debug(f"position bits: {pb}")
-        dictionary_size = int.from_bytes(data[1:5], byteorder="little")
+        dictionary_size = _UINT32["little"].unpack_from(data, 1)[0]
         logging.debug(f"dictionary size: {dictionary_size}")
-        uncompressed_size = int.from_bytes(data[5:13], byteorder="little")
+        uncompressed_size = _UINT32["little"].unpack_from(data, 5)[0]
         logging.debug(f"uncompressed size: {uncompressed_size}")
 
-        decompressed = lzma.LZMADecompressor().decompress(data)
+        # Synthesize the 13-byte header (uncompressed size widened to
+        # 64 bit) instead of copying the whole payload to splice in the
+        # four zero bytes, then feed the tail straight from the view.
+        # Decompressing in chunks also lets the output be hashed while
+        # it is still hot in cache instead of in a second full pass.
+        decompressor = lzma.LZMADecompressor(format=lzma.FORMAT_ALONE)
+        decompressed = bytearray()
+        chunks = itertools.chain(
+            [bytes(data[:9]) + (b"\x00" * 4)],
+            (data[i : i + _CHUNK_SIZE] for i in range(9, len(data), _CHUNK_SIZE)),
+        )
+        for chunk in chunks:
+            chunk = decompressor.decompress(chunk)
+            if hasher is not None:
+                hasher.update(chunk)
+            decompressed += chunk
+        return bytes(decompressed)
+    if hasher is not None:
+        hasher.update(decompressed)
     return decompressed
 
 
+@functools.cache
+def _astc_encoder():
+    # Optional SIMD-accelerated decoder wrapping ARM's astcenc
+    # Credits: https://github.com/K0lb3/astc-encoder-py
+    try:
+        import astc_encoder
+    except ImportError:
+        return None
+    return astc_encoder
+
+
+def decode_astc(pixels, width, height, block_width, block_height):
+    astc = _astc_encoder()
+    if astc is None:
+        decoded = texture2ddecoder.decode_astc(
+            pixels, width, height, block_width, block_height
+        )
+        return decoded, "BGRA"
+    config = astc.ASTCConfig(astc.ASTCProfile.LDR, block_width, block_height)
+    image = astc.ASTCImage(astc.ASTCType.U8, width, height)
+    astc.ASTCContext(config).decompress(
+        bytes(pixels), image, astc.ASTCSwizzle.from_str("RGBA")
+    )
+    return image.data, "RGBA"
+
+
 def process_csv(file_name, data, path):
     decompressed = decompress(data)
     with open(os.path.join(path, file_name), "wb") as f:
         f.write(decompressed)
 
 
+def _image_rgba8888(width, height, pixels):
+    # frombuffer aliases the input instead of copying it
+    return Image.frombuffer("RGBA", (width, height), pixels, "raw", "RGBA", 0, 1)
+
+
+@functools.cache
+def _rgba4444_lut():
+    # Every 16-bit pixel value maps to a fixed RGBA tuple, so decode all
+    # 65536 of them once and turn the per-image work into a single gather.
+    arr = np.arange(65536, dtype=np.uint16)
+    r = ((arr >> 12) & 0xF).astype(np.uint8)
+    g = ((arr >> 8) & 0xF).astype(np.uint8)
+    b = ((arr >> 4) & 0xF).astype(np.uint8)
+    a = ((arr >> 0) & 0xF).astype(np.uint8)
+    # Replicate the nibble into the low bits so 0xF maps to 255, not 240.
+    r = (r << 4) | r
+    g = (g << 4) | g
+    b = (b << 4) | b
+    a = (a << 4) | a
+    return np.stack([r, g, b, a], axis=-1)
+
+
+@functools.cache
+def _rgba5551_lut():
+    arr = np.arange(65536, dtype=np.uint16)
+    r = ((arr >> 11) & 0x1F).astype(np.uint8)
+    g = ((arr >> 6) & 0x1F).astype(np.uint8)
+    b = ((arr >> 1) & 0x1F).astype(np.uint8)
+    a = ((arr & 0x1) * 255).astype(np.uint8)
+    # replicate the top bits into the low bits (5 -> 8 bit)
+    r = (r << 3) | (r >> 2)
+    g = (g << 3) | (g >> 2)
+    b = (b << 3) | (b >> 2)
+    return np.stack([r, g, b, a], axis=-1)
+
+
+def _image_rgba4444(width, height, pixels):
+    arr = np.frombuffer(pixels, dtype="<u2").reshape(height, width)
+    return Image.fromarray(_rgba4444_lut()[arr])
+
+
+def _image_rgba5551(width, height, pixels):
+    arr = np.frombuffer(pixels, dtype="<u2").reshape(height, width)
+    return Image.fromarray(_rgba5551_lut()[arr])
+
+
+def _image_rgb565(width, height, pixels):
+    return Image.frombytes("RGB", (width, height), pixels, "raw", "BGR;16")
+
+
+def _image_la88(width, height, pixels):
+    # already PIL's internal layout, so alias the buffer like RGBA8888
+    return Image.frombuffer("LA", (width, height), pixels, "raw", "LA", 0, 1)
+
+
+def _image_l8(width, height, pixels):
+    return Image.frombuffer("L", (width, height), pixels, "raw", "L", 0, 1)
+
+
+_IMAGE_DECODERS = {
+    0: _image_rgba8888,  # RGB8888
+    1: _image_rgba8888,  # RGB8888
+    2: _image_rgba4444,
+    3: _image_rgba5551,
+    4: _image_rgb565,
+    6: _image_la88,
+    10: _image_l8,
+}
+
+_PIXEL_SIZES = {0: 4, 1: 4, 2: 2, 3: 2, 4: 2, 6: 2, 10: 1}
+
+
 def create_image(width, height, pixels, sub_type):
-    if sub_type == 0 or sub_type == 1:  # RGB8888
-        return Image.frombytes("RGBA", (width, height), pixels, "raw")
-    elif sub_type == 2:  # RGBA4444
-        img = Image.new("RGBA", (width, height))
-        ps = img.load()
-        for h in range(height):
-            for w in range(width):
-                i = (w + h * width) * 2
-                p = int.from_bytes(pixels[i : i + 2], "little")
-                ps[w, h] = (
-                    ((p >> 12) & 0xF) << 4,
-                    ((p >> 8) & 0xF) << 4,
-                    ((p >> 4) & 0xF) << 4,
-                    ((p >> 0) & 0xF) << 4,
-                )
-        return img
-    elif sub_type == 3:  # RBGA5551
-        args = ("RGBA;4B", 0, 0)
-        return Image.frombytes("RGBA", (width, height), pixels, "raw", args)
-    elif sub_type == 4:  # RGB565
-        img = Image.new("RGB", (width, height))
-        ps = img.load()
-        for h in range(height):
-            for w in range(width):
-                i = (w + h * width) * 2
-                p = int.from_bytes(pixels[i : i + 2], "little")
-                ps[w, h] = (
-                    ((p >> 11) & 0x1F) << 3,
-                    ((p >> 5) & 0x3F) << 2,
-                    (p & 0x1F) << 3,
-                )
-        return img
-    elif sub_type == 6:  # LA88
-        return Image.frombytes("LA", (width, height), pixels)
-    elif sub_type == 10:  # L8
-        return Image.frombytes("L", (width, height), pixels)
-    else:
-        raise Exception(f"Unknown sub type '{sub_type}'")
+    try:
+        image_decoder = _IMAGE_DECODERS[sub_type]
+    except KeyError:
+        raise Exception(f"Unknown sub type '{sub_type}'") from None
+    return image_decoder(width, height, pixels)
+
+
+# Extraction output: favor encode speed over the last few percent of
+# deflate ratio by default (zlib level 1 instead of Pillow's 6).
+_png_compress_level = 1
+
+
+@functools.cache
+def _pyvips():
+    # Optional libvips backend; its PNG encoder runs filtering and
+    # deflate across a thread pool, unlike Pillow's single-threaded path.
+    # The binding raises OSError when libvips itself is missing.
+    try:
+        import pyvips
+    except (ImportError, OSError):
+        return None
+    return pyvips
+
+
+def save_png(img, file_path):
+    pyvips = _pyvips()
+    if pyvips is not None:
+        vips_img = pyvips.Image.new_from_memory(
+            img.tobytes(), img.width, img.height, len(img.getbands()), "uchar"
+        )
+        vips_img.pngsave(file_path, compression=_png_compress_level)
+        return
+    with open(file_path, "wb") as f:
+        img.save(f, "PNG", compress_level=_png_compress_level, optimize=False)
 
 
 def pixel_size(sub_type):
-    if sub_type in [0, 1]:
-        return 4
-    elif sub_type in [2, 3, 4, 6]:
-        return 2
-    elif sub_type in [10]:
-        return 1
-    else:
-        raise Exception(f"Unknown sub type '{sub_type}'")
+    try:
+        return _PIXEL_SIZES[sub_type]
+    except KeyError:
+        raise Exception(f"Unknown sub type '{sub_type}'") from None
 
 
 def process_sctx(base_name, data, path):
     reader = Reader(data)
-    reader.read(52)
+    reader.skip(52)
     width = reader.read_uint16()
     height = reader.read_uint16()
     file_type = reader.read_uint32()
     length = reader.read_uint32()
-    reader.read(16)
-    reader.read(reader.read_uint32())
-    reader.read(52)
+    reader.skip(16)
+    reader.skip(reader.read_uint32())
+    reader.skip(52)
     logging.info(
         f"file_type: {file_type}, file_size: {length}, width: {width}, height: {height}"
     )
 
     if file_type == 12:
         block_width = block_height = 4
-        pixels = reader.read()
+        pixels = bytes(reader.read())
     elif file_type == 5:
         pixels = decompress(reader.read())
         block_width = block_height = 8
     else:
         raise Exception(f"Unknown file type '{file_type}'")
 
-    pixels = texture2ddecoder.decode_astc(
-        pixels,
-        width,
-        height,
-        block_width,
-        block_height,
-    )
-    img = Image.frombytes("RGBA", (width, height), pixels, "raw", "BGRA")
-    img.save(os.path.join(path, f"{base_name}.png"))
+    pixels, rawmode = decode_astc(pixels, width, height, block_width, block_height)
+    img = Image.frombytes("RGBA", (width, height), pixels, "raw", rawmode)
+    save_png(img, os.path.join(path, f"{base_name}.png"))
 
 
 def process_ktx(base_name, data, path):
     reader = Reader(data)
 
-    identifier = reader.read(12)
+    identifier = bytes(reader.read(12))
     if b"KTX 11" in identifier:
         image_data, height, width, file_type = process_ktx11(reader)
     elif b"KTX 20" in identifier:
@@ -199,95 +337,72 @@ def process_ktx(base_name, data, path):
     else:
         raise Exception(f"Unknown KTX identifier '{identifier}'")
 
+    image_data = bytes(image_data)
     logging.info(
         f"file_type: {file_type}, width: {width}, height: {height}"
     )
     if file_type == 157:  # VK_FORMAT_ASTC_4x4_UNORM_BLOCK
-        pixels = texture2ddecoder.decode_astc(
-            image_data,
-            width,
-            height,
-            4,
-            4,
-        )
+        pixels, rawmode = decode_astc(image_data, width, height, 4, 4)
     elif file_type == 165:  # VK_FORMAT_ASTC_6x6_UNORM_BLOCK
-        pixels = texture2ddecoder.decode_astc(
-            image_data,
-            width,
-            height,
-            6,
-            6,
-        )
+        pixels, rawmode = decode_astc(image_data, width, height, 6, 6)
     elif file_type in [171, 172]:  # VK_FORMAT_ASTC_8x8_UNORM_BLOCK
-        pixels = texture2ddecoder.decode_astc(
-            image_data,
-            width,
-            height,
-            8,
-            8,
-        )
+        pixels, rawmode = decode_astc(image_data, width, height, 8, 8)
     elif file_type == 0x8D64:  # ETC1_RGB8_OES
         pixels = texture2ddecoder.decode_etc1(image_data, width, height)
+        rawmode = "BGRA"
     elif file_type == 0x93B0:  # COMPRESSED_RGBA_ASTC_4x4_KHR
-        pixels = texture2ddecoder.decode_astc(
-            image_data,
-            width,
-            height,
-            4,
-            4,
-        )
+        pixels, rawmode = decode_astc(image_data, width, height, 4, 4)
     elif file_type == 0x93B4:  # COMPRESSED_RGBA_ASTC_6x6_KHR
-        pixels = texture2ddecoder.decode_astc(
-            image_data,
-            width,
-            height,
-            6,
-            6,
-        )
+        pixels, rawmode = decode_astc(image_data, width, height, 6, 6)
     else:
         raise Exception(f"Unknown file type '{file_type}'")
 
-    img = Image.frombytes("RGBA", (width, height), pixels, "raw", "BGRA")
-    img.save(os.path.join(path, f"{base_name}.png"))
+    img = Image.frombytes("RGBA", (width, height), pixels, "raw", rawmode)
+    save_png(img, os.path.join(path, f"{base_name}.png"))
 
 
 def process_ktx11(reader):
-    reader.read(16)
+    reader.skip(16)
     gl_internal_format = reader.read_uint32()
-    reader.read(4)
+    reader.skip(4)
     pixel_width = reader.read_uint32()
     pixel_height = reader.read_uint32()
-    reader.read(16)
-    reader.read(reader.read_uint32())
-    reader.read(4)
+    reader.skip(16)
+    reader.skip(reader.read_uint32())
+    reader.skip(4)
     return reader.read(), pixel_height, pixel_width, gl_internal_format
 
 
 def process_ktx20(reader):
     vk_format = reader.read_uint32()
-    reader.read(4)
+    reader.skip(4)
     pixel_width = reader.read_uint32()
     pixel_height = reader.read_uint32()
-    reader.read(12)
+    reader.skip(12)
     level_count = reader.read_uint32()
-    reader.read(4)
+    reader.skip(4)
     # index
-    reader.read(8)
+    reader.skip(8)
     kvd_byte_offset = reader.read_uint32()
     kvd_byte_length = reader.read_uint32()
-    reader.read(4)
+    reader.skip(4)
     sgd_byte_length = reader.read_uint32()
-    reader.read(8)
+    reader.skip(8)
     # level index
     for _ in range(max(1, level_count)):
-        reader.read(24)
-    reader.read(reader.read_uint32() - 4)
-    while reader._bytes_read < kvd_byte_offset + kvd_byte_length:
-        key_and_value = reader.read(reader.read_uint32())
-        logging.debug(key_and_value.replace(b"\0", b" ").decode("ascii"))
+        reader.skip(24)
+    reader.skip(reader.read_uint32() - 4)
+    debug = logging.root.isEnabledFor(logging.DEBUG)
+    while reader.tell() < kvd_byte_offset + kvd_byte_length:
+        length = reader.read_uint32()
+        if debug:
+            key_and_value = bytes(reader.read(length))
+            logging.debug(key_and_value.replace(b"\0", b" ").decode("ascii"))
+        else:
+            reader.skip(length)
         reader.align_to(4)
     reader.align_to(16)
-    reader.read(sgd_byte_length)
+    reader.skip(sgd_byte_length)
     return reader.read(), pixel_height, pixel_width, vk_format
 
 
@@ -299,6 +414,31 @@ def process_file_type_47(file_path, path):
     return process_sctx(os.path.splitext(base_name)[0], data, path)
 
 
+_FILE_TYPES = frozenset({1, 8, 12, 24, 27, 28, 45, 47, 49})
+
+
+def _detile(raw, pixels, width, height, pixel_sz, block_sz):
+    pos = 0
+    for _h in range(0, height, block_sz):
+        for _w in range(0, width, block_sz):
+            for h in range(_h, min(_h + block_sz, height)):
+                i = (_w + h * width) * pixel_sz
+                sz = min(block_sz, width - _w) * pixel_sz
+                pixels[i : i + sz] = raw[pos : pos + sz]
+                pos += sz
+
+
+@functools.cache
+def _detile_compiled():
+    # Optional: JIT the ragged-edge fallback when Numba is installed;
+    # the aligned case is handled by the NumPy reshape/transpose.
+    try:
+        import numba
+    except ImportError:
+        return _detile
+    return numba.njit(cache=True)(_detile)
+
+
 def process_sc(base_dir, base_name, data, path, old):
     reader = Reader(data)
     reader.read(2)
@@ -309,9 +449,10 @@ def process_sc(base_dir, base_name, data, path, old):
     md5_hash = reader.read(hash_length)
     logging.debug(f"md5 hash: {md5_hash.hex()}")
 
-    decompressed = decompress(reader.read())
+    hasher = hashlib.md5(usedforsecurity=False)
+    decompressed = decompress(reader.read(), hasher)
 
-    if hashlib.md5(decompressed).digest() != md5_hash:
+    if hasher.digest() != md5_hash:
         logging.debug("File seems corrupted")
 
     reader = Reader(decompressed)
@@ -320,21 +461,26 @@ def process_sc(base_dir, base_name, data, path, old):
         # Credits: https://github.com/Galaxy1036/Old-Sc-Dumper
         reader.read(17)
         count = reader.read_uint16()
-        reader.read(count * 2)
+        reader.skip(count * 2)
         for i in range(count):  # skip strings
             reader.read_string()
 
     count = 0
+    png_path = os.path.join(path, base_name)
+    # bind the per-record readers once; they fire twice per record
+    read_byte = reader.read_byte
+    read_uint16 = reader.read_uint16
+    read_uint32 = reader.read_uint32
     while len(reader):
-        file_type = reader.read_byte()
-        file_size = reader.read_uint32()
+        file_type = read_byte()
+        file_size = read_uint32()
 
         if file_size == 0:
             continue
 
-        if file_type not in [1, 8, 12, 24, 27, 28, 45, 47, 49]:
+        if file_type not in _FILE_TYPES:
             logging.error(f"Unknown file_type: {file_type}")
-            data = reader.read(file_size)
+            reader.skip(file_size)
             continue
 
         if file_type == 8:
@@ -342,40 +488,70 @@ def process_sc(base_dir, base_name, data, path, old):
             continue
 
         if file_type == 12:
-            data = reader.read(file_size)
+            reader.skip(file_size)
             continue
 
         if file_type == 45:
-            file_size = reader.read_uint32()
+            file_size = read_uint32()
 
         if file_type == 47:
             file_name = reader.read_string()
 
         if file_type == 49:
-            data = reader.read(file_size)
+            reader.skip(file_size)
             continue
 
-        sub_type = reader.read_byte()
-        width = reader.read_uint16()
-        height = reader.read_uint16()
+        sub_type = read_byte()
+        width = read_uint16()
+        height = read_uint16()
 
         logging.info(
             f"file_type: {file_type}, file_size: {file_size}, "
             f"sub_type: {sub_type}, width: {width}, height: {height}"
         )
 
+        if file_type not in (45, 47):
+            # Fail before allocating buffers if the record cannot hold
+            # the advertised texture.
+            expected = width * height * pixel_size(sub_type)
+            if min(file_size - 5, len(reader)) < expected:
+                raise Exception(
+                    f"Truncated texture record: expected {expected} bytes "
+                    f"for {width}x{height} sub_type {sub_type}"
+                )
+
         img = None
         if file_type == 27 or file_type == 28:
             pixel_sz = pixel_size(sub_type)
             block_sz = 32
-            pixels = bytearray(file_size - 5)
-            for _h in range(0, height, block_sz):
-                for _w in range(0, width, block_sz):
-                    for h in range(_h, min(_h + block_sz, height)):
-                        i = (_w + h * width) * pixel_sz
-                        sz = min(block_sz, width - _w) * pixel_sz
-                        pixels[i : i + sz] = reader.read(sz)
-            pixels = bytes(pixels)
+            raw = reader.read(file_size - 5)
+            if width <= block_sz:
+                # A single column of blocks is already in raster order.
+                pixels = raw
+            elif width % block_sz == 0 and height % block_sz == 0:
+                # Blocks are stored row-major, rows contiguous within a
+                # block, so the de-tile is a single reshape/transpose.
+                pixels = (
+                    np.frombuffer(raw, dtype=np.uint8)
+                    .reshape(
+                        height // block_sz,
+                        width // block_sz,
+                        block_sz,
+                        block_sz * pixel_sz,
+                    )
+                    .transpose(0, 2, 1, 3)
+                    .reshape(height, width * pixel_sz)
+                )
+            else:
+                pixels = np.empty(file_size - 5, dtype=np.uint8)
+                _detile_compiled()(
+                    np.frombuffer(raw, dtype=np.uint8),
+                    pixels,
+                    width,
+                    height,
+                    pixel_sz,
+                    block_sz,
+                )
             img = create_image(width, height, pixels, sub_type)
         elif file_type == 45:
             process_ktx(base_name, reader.read(), path)
@@ -387,20 +563,48 @@ def process_sc(base_dir, base_name, data, path, old):
             pixels = reader.read(file_size - 5)
             img = create_image(width, height, pixels, sub_type)
 
-        img.save(os.path.join(path, f"{base_name}_{count}.png"))
+        save_png(img, f"{png_path}_{count}.png")
         count += 1
 
 
+def process_file(file, path, old, compress_level=1):
+    global _png_compress_level
+    _png_compress_level = compress_level
+
+    base_dir = os.path.dirname(file)
+    base_name, ext = os.path.splitext(os.path.basename(file))
+    logging.info(base_name + ext)
+    # Map instead of read: slices stay zero-copy views into the page
+    # cache. The mapping is released when the last view is collected.
+    with open(file, "rb") as f:
+        data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    file_type = check_header(data)
+
+    if file_type == "csv":
+        process_csv(base_name + ext, data, path)
+    elif file_type == "sig:":
+        process_csv(base_name + ext, data[68:], path)
+    elif file_type == "sc":
+        process_sc(base_dir, base_name, data, path, old)
+    elif file_type == "ktx":
+        process_ktx(base_name, data, path)
+    elif file_type == "sctx":
+        process_sctx(base_name, data, path)
+
+
 def check_header(data):
-    if data[0] == 0x5D:
+    # slice once; the sub-slices below then only touch a 12-byte local
+    head = bytes(data[:12])
+    if head[0] == 0x5D:
         return "csv"
-    if data[:2] == b"\x53\x43":
+    if head[:2] == b"\x53\x43":
         return "sc"
-    if data[:4] == b"\x53\x69\x67\x3a":
+    if head[:4] == b"\x53\x69\x67\x3a":
         return "sig:"
-    if data[:5] == b"\xab\x4b\x54\x58\x20":
+    if head[:5] == b"\xab\x4b\x54\x58\x20":
         return "ktx"
-    if data[8:12] == b"SCTX":
+    if head[8:12] == b"SCTX":
         return "sctx"
     raise Exception("  Unknown header")
 
@@ -410,9 +614,36 @@ if __name__ == "__main__":
     parser.add_argument("files", help="sc file", nargs="+")
     parser.add_argument("--old", action="store_true", help="used for '*_dl.sc' files")
     parser.add_argument("-o", help="Extract pngs to directory", type=str)
+    parser.add_argument(
+        "-c",
+        "--compress-level",
+        type=int,
+        default=1,
+        choices=range(10),
+        help="PNG zlib compression level (default: 1)",
+    )
+    parser.add_argument(
+        "-r",
+        "--recursive",
+        action="store_true",
+        help="treat files as directories and process sc/csv/ktx/sctx files inside",
+    )
     parser.add_argument("--verbose", action="store_true", help="Print debug infos")
     args = parser.parse_args()
 
+    if args.recursive:
+        files = []
+        for root in args.files:
+            for dirpath, _, names in os.walk(root):
+                files += (
+                    os.path.join(dirpath, name)
+                    for name in names
+                    if os.path.splitext(name)[1] in (".sc", ".csv", ".ktx", ".sctx")
+                )
+        args.files = sorted(files)
+        if not args.files:
+            raise Exception("No sc/csv/ktx/sctx files found")
+
     if args.o:
         path = os.path.normpath(args.o)
     else:
@@ -421,22 +652,21 @@ if __name__ == "__main__":
     level = logging.DEBUG if args.verbose else logging.INFO
     logging.basicConfig(format="", level=level)
 
-    for file in args.files:
-        base_dir = os.path.dirname(file)
-        base_name, ext = os.path.splitext(os.path.basename(file))
-        logging.info(base_name + ext)
-        with open(file, "rb") as f:
-            data = f.read()
-
-        file_type = check_header(data)
-
-        if file_type == "csv":
-            process_csv(base_name + ext, data, path)
-        elif file_type == "sig:":
-            process_csv(base_name + ext, data[68:], path)
-        elif file_type == "sc":
-            process_sc(base_dir, base_name, data, path, args.old)
-        elif file_type == "ktx":
-            process_ktx(base_name, data, path)
-        elif file_type == "sctx":
-            process_sctx(base_name, data, path)
+    if len(args.files) == 1:
+        process_file(args.files[0], path, args.old, args.compress_level)
+    else:
+        # Files are independent decompress/decode/encode pipelines, so
+        # fan them out across cores.
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=min(len(args.files), os.cpu_count() or 1)
+        ) as executor:
+            for _ in executor.map(
+                functools.partial(
+                    process_file,
+                    path=path,
+                    old=args.old,
+                    compress_level=args.compress_level,
+                ),
+                args.files,
+            ):
+                pass